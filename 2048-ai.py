@@ -4,7 +4,36 @@
 """
 
 import gdb
+import json
+import os
 import random
+import re
+import struct
+import sys
+from pathlib import Path
+
+# The search core lives in bitboard.py next to this script (src/python/ai);
+# the copy at the repository root finds it there too
+_here = os.path.dirname(os.path.abspath(__file__))
+sys.path[:0] = [_here, os.path.join(_here, "src", "python", "ai")]
+
+from bitboard import DIRECTIONS, best_move, can_move, encode, free_cells, is_board
+
+# Last known board address, reused across sessions so we can skip the scan
+CACHE_FILE = Path.home() / ".cache" / "2048-ai-board-addr"
+
+# "start end size offset [perms] [objfile]" rows of `info proc mappings`
+# (the perms column only exists in newer GDB versions)
+_MAPPING_RE = re.compile(
+    r'^\s*(0x[0-9a-fA-F]+)\s+(0x[0-9a-fA-F]+)\s+0x[0-9a-fA-F]+\s+0x[0-9a-fA-F]+'
+    r'(?:\s+([r-][w-][x-][ps-]))?\s*(.*)$'
+)
+
+# Common first-row patterns to search for, packed once as little-endian ints
+BOARD_PATTERNS = [
+    struct.pack("<4i", *pattern)
+    for pattern in ([0, 0, 0, 2], [2, 0, 0, 0], [0, 2, 0, 0], [2, 2, 0, 0])
+]
 
 class GameBoard:
     """Represents the 2048 game board."""
@@ -12,88 +41,144 @@ class GameBoard:
     def __init__(self):
         self.address = None
         self.board = None
+        self._inf = None
         
     def find_board(self):
         """Try to locate the game board in memory."""
-        print("🔍 Searching for game board...")
+        # Cheap path: re-check the last known address before scanning
+        for addr in (self.address, self._load_cache()):
+            if addr and self._verify_board(addr):
+                self.address = addr
+                print(f"✅ Found board at {hex(addr)} (cached)")
+                return True
         
-        # Common patterns to search for
-        patterns = [
-            [0, 0, 0, 2],
-            [2, 0, 0, 0],
-            [0, 2, 0, 0],
-            [2, 2, 0, 0]
-        ]
+        print("🔍 Searching for game board...")
         
-        # Search in likely memory ranges
-        for pattern in patterns:
-            cmd = f"find /w 0x400000, 0x700000, {', '.join(map(str, pattern))}"
-            try:
-                results = gdb.execute(cmd, to_string=True)
-                
-                for line in results.split('\n'):
-                    if '0x' in line:
-                        addr = int(line.split()[0], 16)
-                        # Check if this could be the start of a board
-                        if self._verify_board(addr):
-                            self.address = addr
-                            print(f"✅ Found board at {hex(addr)}")
-                            return True
-            except:
-                pass
+        # Only scan regions the board can actually live in
+        regions = list(self._writable_regions())
+        for pattern in BOARD_PATTERNS:
+            for addr in self._search(pattern, regions):
+                # Check if this could be the start of a board
+                if self._verify_board(addr):
+                    self.address = addr
+                    self._save_cache()
+                    print(f"✅ Found board at {hex(addr)}")
+                    return True
                 
         return False
     
+    def _search(self, pattern, regions):
+        """Yield every address in regions where the packed pattern occurs."""
+        inf = self._inferior()
+        for lo, hi in regions:
+            addr = lo
+            while addr is not None and addr + len(pattern) <= hi:
+                try:
+                    addr = inf.search_memory(addr, hi - addr, pattern)
+                except gdb.error:
+                    break
+                if addr is not None:
+                    yield addr
+                    addr += 4
+    
+    def _writable_regions(self):
+        """Yield (lo, hi) for writable heap, bss and anonymous mappings."""
+        # Mappings name the binary by its real path, not a symlink it ran through
+        exe = gdb.current_progspace().filename
+        exe = os.path.realpath(exe) if exe else None
+        try:
+            mappings = gdb.execute("info proc mappings", to_string=True)
+        except gdb.error:
+            mappings = ""
+        
+        found = False
+        for line in mappings.split('\n'):
+            match = _MAPPING_RE.match(line)
+            if not match:
+                continue
+            lo, hi, perms, path = match.groups()
+            if perms is not None and 'w' not in perms:
+                continue
+            # Skip shared libraries, the stack and kernel-provided pages;
+            # the binary itself is kept for its .data/.bss segment
+            path = path.strip()
+            if path and path not in ('[heap]', '[anon]') and os.path.realpath(path) != exe:
+                continue
+            found = True
+            yield int(lo, 16), int(hi, 16)
+        
+        if not found:
+            # No mapping info (e.g. remote target); fall back to the old range
+            yield 0x400000, 0x700000
+    
+    def _cache_key(self):
+        """Identify the current process as (pid, executable)."""
+        return self._inferior().pid, gdb.current_progspace().filename
+    
+    def _load_cache(self):
+        """Return the cached board address if it belongs to this process."""
+        try:
+            cache = json.loads(CACHE_FILE.read_text())
+            pid, exe = self._cache_key()
+        except (OSError, ValueError, gdb.error):
+            return None
+        
+        # GDB disables ASLR by default, so the same binary reuses addresses
+        if cache.get("pid") != pid and cache.get("exe") != exe:
+            return None
+        return cache.get("addr")
+    
+    def _save_cache(self):
+        """Remember the board address for the next find_board()."""
+        try:
+            pid, exe = self._cache_key()
+            CACHE_FILE.parent.mkdir(parents=True, exist_ok=True)
+            CACHE_FILE.write_text(json.dumps({"pid": pid, "exe": exe, "addr": self.address}))
+        except (OSError, gdb.error):
+            pass
+    
+    def invalidate(self, event=None):
+        """Forget the board address once the inferior is gone."""
+        self.address = None
+        self.board = None
+        self._inf = None
+        try:
+            CACHE_FILE.unlink()
+        except OSError:
+            pass
+    
     def _verify_board(self, addr):
         """Verify if address contains a valid game board."""
         try:
-            # Read 16 integers
-            values = []
-            for i in range(16):
-                val = self._read_int(addr + i * 4)
-                values.append(val)
-            
-            # Check if it looks like a game board
-            # All values should be 0 or powers of 2
-            for val in values:
-                if val < 0 or val > 65536:  # Unreasonable values
-                    return False
-                if val != 0 and (val & (val - 1)) != 0:  # Not power of 2
-                    return False
-            
-            # Should have some empty cells and some tiles
-            zeros = sum(1 for v in values if v == 0)
-            if zeros == 0 or zeros == 16:
-                return False
-                
-            self.board = values
-            return True
+            values = self._read_board_raw(addr)
+        except gdb.MemoryError:
+            return False
             
-        except:
+        # All values 0 or powers of 2, with some empty cells and some tiles
+        if not is_board(values):
             return False
+            
+        self.board = values
+        return True
     
-    def _read_int(self, addr):
-        """Read a 32-bit integer from memory."""
-        result = gdb.execute(f"x/wx {hex(addr)}", to_string=True)
-        # Parse the hex value from output
-        parts = result.split()
-        for part in parts:
-            if part.startswith('0x'):
-                return int(part, 16)
-        return 0
+    def _inferior(self):
+        """Return the selected inferior, cached until it goes away."""
+        if self._inf is None or not self._inf.is_valid():
+            self._inf = gdb.selected_inferior()
+        return self._inf
+    
+    def _read_board_raw(self, addr):
+        """Read all 16 cells as one 64-byte block of inferior memory."""
+        buf = self._inferior().read_memory(addr, 64).tobytes()
+        return list(struct.unpack("<16i", buf))
     
     def read_board(self):
         """Read current board state."""
         if not self.address:
             return None
             
-        board = []
-        for i in range(16):
-            val = self._read_int(self.address + i * 4)
-            board.append(val)
-        
-        self.board = board
-        return board
+        self.board = self._read_board_raw(self.address)
+        return self.board
     
     def display(self):
         """Display the board."""
@@ -115,17 +200,19 @@ class GameBoard:
         print("  " + "-" * 25)
 
 class AI2048:
-    """Simple AI for 2048."""
+    """Expectimax (or alpha-beta minimax) AI for 2048."""
     
-    def __init__(self, board):
+    ALGORITHMS = ('expectimax', 'alphabeta')
+    
+    def __init__(self, board, algo='expectimax'):
         self.board = board
+        self.algo = algo
         
     def choose_move(self):
-        """Choose the best move using simple strategy."""
+        """Choose the move with the best search value."""
         if not self.board.board:
             return ord('s')  # Default down
         
-        # Check which moves are possible
         moves = {
             'down': ord('s'),
             'right': ord('d'),
@@ -133,55 +220,55 @@ class AI2048:
             'up': ord('w')
         }
         
-        # Simple strategy: prefer down > right > left > up
-        for direction in ['down', 'right', 'left', 'up']:
-            if self._can_move(direction):
-                print(f"🤖 AI chooses: {direction}")
-                return moves[direction]
+        b = encode(self.board.board)
+        
+        # Search deeper as the board fills up and mistakes get costlier
+        free = free_cells(b)
+        depth = 1 if free > 7 else 2 if free > 4 else 3
+        
+        best = best_move(b, depth, self.algo == 'alphabeta')
+        if best < 0:
+            return ord('q')  # No moves possible
         
-        return ord('q')  # No moves possible
+        direction = DIRECTIONS[best]
+        print(f"🤖 AI chooses: {direction}")
+        return moves[direction]
     
     def _can_move(self, direction):
         """Check if a move is possible."""
-        b = self.board.board
-        
-        if direction == 'down':
-            for col in range(4):
-                for row in range(3):
-                    curr = b[row * 4 + col]
-                    below = b[(row + 1) * 4 + col]
-                    if curr != 0 and (below == 0 or below == curr):
-                        return True
-                        
-        elif direction == 'up':
-            for col in range(4):
-                for row in range(1, 4):
-                    curr = b[row * 4 + col]
-                    above = b[(row - 1) * 4 + col]
-                    if curr != 0 and (above == 0 or above == curr):
-                        return True
-                        
-        elif direction == 'left':
-            for row in range(4):
-                for col in range(1, 4):
-                    curr = b[row * 4 + col]
-                    left = b[row * 4 + (col - 1)]
-                    if curr != 0 and (left == 0 or left == curr):
-                        return True
-                        
-        elif direction == 'right':
-            for row in range(4):
-                for col in range(3):
-                    curr = b[row * 4 + col]
-                    right = b[row * 4 + (col + 1)]
-                    if curr != 0 and (right == 0 or right == curr):
-                        return True
-        
-        return False
+        return can_move(encode(self.board.board), DIRECTIONS.index(direction))
 
 # Global instances
 game_board = GameBoard()
 ai = AI2048(game_board)
+gdb.events.exited.connect(game_board.invalidate)
+
+def ai_step():
+    """Show the board and leave the AI's key in $ai_move (see WgetchBP)."""
+    game_board.read_board()
+    game_board.display()
+    gdb.set_convenience_variable("ai_move", ai.choose_move())
+
+class WgetchBP(gdb.Breakpoint):
+    """Breakpoint on wgetch that answers each key read with the AI's move.
+    
+    stop() may not pop frames or resume the game, so the move is made by
+    the breakpoint's commands, which GDB runs once the stop is complete.
+    """
+    
+    def __init__(self):
+        super(WgetchBP, self).__init__("wgetch")
+        self.commands = "\n".join([
+            "silent",
+            "python ai_step()",
+            "with confirm off -- return (int) $ai_move",  # No y/n query
+            "continue",
+        ])
+        
+    def stop(self):
+        return True
+
+wgetch_bp = None
 
 class AICommand(gdb.Command):
     """GDB command to enable AI play."""
@@ -193,6 +280,13 @@ class AICommand(gdb.Command):
         print("🎮 2048 AI Controller")
         print("=" * 40)
         
+        # Optional argument picks the search algorithm
+        if arg:
+            if arg.strip() not in AI2048.ALGORITHMS:
+                print(f"Usage: ai-2048 [{'|'.join(AI2048.ALGORITHMS)}]")
+                return
+            ai.algo = arg.strip()
+        
         # Try to find the board
         if not game_board.address:
             if not game_board.find_board():
@@ -203,22 +297,10 @@ class AICommand(gdb.Command):
                 print("  3. Set manually with 'set-board 0xADDRESS'")
                 return
         
-        # Set up breakpoint
-        gdb.execute("break wgetch")
-        
-        # Define breakpoint commands
-        bp_commands = """commands
-silent
-python
-game_board.read_board()
-game_board.display()
-move = ai.choose_move()
-gdb.execute(f"return {move}")
-end
-end"""
-        
-        for line in bp_commands.split('\n'):
-            gdb.execute(line)
+        # Set up breakpoint (once; re-running ai-2048 just switches settings)
+        global wgetch_bp
+        if wgetch_bp is None or not wgetch_bp.is_valid():
+            wgetch_bp = WgetchBP()
         
         print("✅ AI enabled! Continue to start playing.")
 
@@ -245,6 +327,7 @@ class SetBoardCommand(gdb.Command):
         try:
             addr = int(arg, 16) if arg.startswith('0x') else int(arg)
             game_board.address = addr
+            game_board._save_cache()
             print(f"Board address set to {hex(addr)}")
             game_board.read_board()
             game_board.display()
@@ -271,7 +354,7 @@ SetBoardCommand()
 ShowBoardCommand()
 
 print("🎮 2048 AI loaded! Commands:")
-print("  ai-2048     - Enable AI auto-play")
+print("  ai-2048     - Enable AI auto-play (ai-2048 alphabeta for minimax)")
 print("  find-board  - Search for game board")
 print("  show-board  - Display current board")
 print("  set-board   - Manually set board address")
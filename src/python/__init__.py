@@ -0,0 +1,5 @@
+"""
+GDB Game AI - analyze and control games through GDB.
+
+Installed as the gdb_game_ai package; inside a checkout it is src.python.
+"""
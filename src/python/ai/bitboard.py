@@ -0,0 +1,296 @@
+#!/usr/bin/env python3
+"""
+Bitboard search core for the 2048 AI.
+
+The 16 cells are packed into one 64-bit int, 4 bits per cell holding log2 of
+the tile (0 = empty). Cell i = row * 4 + col lives at bits 4*i..4*i+3, so each
+row is one 16-bit chunk with col 0 lowest. Four bits cap tiles at 32768, same
+as the usual 2048 bitboard engines.
+
+Everything on the search path is written in the subset numba can compile
+(ints, flat arrays, no dicts of callables) and is JIT-compiled when numba is
+installed. Without numba the same functions run as plain Python on
+unsigned ints; numba gets the same bits as an int64 (see _native). The
+recursive search functions are not cached on disk: numba cannot reload cached
+recursive functions reliably, so they are recompiled once per GDB session.
+"""
+
+import math
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+try:
+    from numba import njit, types
+    from numba.typed import Dict
+    HAVE_NUMBA = True
+except ImportError:
+    HAVE_NUMBA = False
+
+    def njit(*args, **kwargs):
+        """Stand-in for numba.njit when numba is not installed."""
+        if args and callable(args[0]):
+            return args[0]
+        return lambda func: func
+
+# Direction indices, in the order ties are broken (down/right first)
+DIRECTIONS = ('down', 'right', 'left', 'up')
+DOWN, RIGHT, LEFT, UP = range(4)
+
+# Snake-shaped weights: a monotone chain ending in the bottom-right corner
+SNAKE_RANKS = (
+    3, 2, 1, 0,
+    4, 5, 6, 7,
+    11, 10, 9, 8,
+    12, 13, 14, 15
+)
+FREE_WEIGHT = 1 << 16
+
+# Chance-node values are memoised per move, up to this many positions
+TT_MAX_SIZE = 1 << 20
+
+def is_board(cells):
+    """Check that cells look like a 2048 board.
+    
+    Every cell must be 0 or a power of 2 up to 65536, with at least one empty
+    cell and at least one tile. With numpy, cells may also be an (N, 16)
+    array, giving one answer per row.
+    """
+    if np is None:
+        zeros = sum(1 for v in cells if v == 0)
+        tiles = sum(1 for v in cells if 0 < v <= 65536 and (v & (v - 1)) == 0)
+        return 0 < zeros < 16 and zeros + tiles == 16
+    
+    a = np.asarray(cells, dtype=np.int64)
+    valid = ((a >= 0) & (a <= 65536) & ((a & (a - 1)) == 0)).all(axis=-1)
+    zeros = (a == 0).sum(axis=-1)
+    return valid & (zeros > 0) & (zeros < 16)
+
+def encode(board):
+    """Pack a flat list of 16 tile values into an unsigned 64-bit bitboard."""
+    bits = 0
+    for i, val in enumerate(board):
+        if val > 0:
+            bits |= min(val.bit_length() - 1, 15) << (4 * i)
+    return bits
+
+def decode(bits):
+    """Unpack a bitboard into a flat list of 16 tile values."""
+    board = []
+    for i in range(16):
+        rank = (bits >> (4 * i)) & 0xF
+        board.append(1 << rank if rank else 0)
+    return board
+
+def _reverse_row(row):
+    """Mirror a packed 4-cell row."""
+    return ((row & 0xF) << 12) | ((row & 0xF0) << 4) | ((row >> 4) & 0xF0) | (row >> 12)
+
+def slide_row(row):
+    """Slide and merge a packed row towards column 0 (a 'left' move)."""
+    cells = [(row >> (4 * i)) & 0xF for i in range(4)]
+    tiles = [c for c in cells if c]
+    merged = []
+    i = 0
+    while i < len(tiles):
+        if i + 1 < len(tiles) and tiles[i] == tiles[i + 1]:
+            merged.append(min(tiles[i] + 1, 15))
+            i += 2
+        else:
+            merged.append(tiles[i])
+            i += 1
+    result = 0
+    for i, rank in enumerate(merged):
+        result |= rank << (4 * i)
+    return result
+
+# Every possible row slid left/right, plus the snake weights, computed once.
+# numba gets flat int64 arrays; plain Python is faster on lists.
+LEFT_MOVE = [slide_row(row) for row in range(65536)]
+RIGHT_MOVE = [_reverse_row(LEFT_MOVE[_reverse_row(row)]) for row in range(65536)]
+SNAKE = [4 ** k for k in SNAKE_RANKS]
+if HAVE_NUMBA:
+    LEFT_MOVE = np.array(LEFT_MOVE, dtype=np.int64)
+    RIGHT_MOVE = np.array(RIGHT_MOVE, dtype=np.int64)
+    SNAKE = np.array(SNAKE, dtype=np.int64)
+
+def _native(b):
+    """Bitboard in the form the search functions expect.
+    
+    numba compiles them for int64, so a board with bit 63 set (a tile of 256
+    or more in the last cell) is passed as its negative two's complement.
+    Plain Python keeps it unsigned: its ints never wrap, and a negative board
+    would compare unequal to the unsigned result of every move.
+    """
+    b &= 0xFFFFFFFFFFFFFFFF
+    if HAVE_NUMBA and b >> 63:
+        return b - (1 << 64)
+    return b
+
+@njit(cache=True)
+def transpose(b):
+    """Swap rows and columns of a bitboard."""
+    a1 = b & 0xF0F00F0FF0F00F0F
+    a2 = b & 0x0000F0F00000F0F0
+    a3 = b & 0x0F0F00000F0F0000
+    a = a1 | (a2 << 12) | (a3 >> 12)
+    b1 = a & 0xFF00FF0000FF00FF
+    b2 = a & 0x00FF00FF00000000
+    b3 = a & 0x00000000FF00FF00
+    return b1 | (b2 >> 24) | (b3 << 24)
+
+@njit(cache=True)
+def slide_rows(b, table):
+    """Apply a row lookup table to each of the four rows."""
+    return (table[b & 0xFFFF]
+            | (table[(b >> 16) & 0xFFFF] << 16)
+            | (table[(b >> 32) & 0xFFFF] << 32)
+            | (table[(b >> 48) & 0xFFFF] << 48))
+
+@njit(cache=True)
+def move(b, direction, left, right):
+    """Board after sliding in direction (one of DOWN, RIGHT, LEFT, UP)."""
+    if direction == LEFT:
+        return slide_rows(b, left)
+    if direction == RIGHT:
+        return slide_rows(b, right)
+    if direction == UP:
+        return transpose(slide_rows(transpose(b), left))
+    return transpose(slide_rows(transpose(b), right))
+
+@njit(cache=True)
+def _free_cells(b):
+    """Count empty cells on a bitboard."""
+    count = 0
+    for i in range(16):
+        if (b >> (4 * i)) & 0xF == 0:
+            count += 1
+    return count
+
+@njit(cache=True)
+def score(b, snake):
+    """Heuristic value of a position: snake ordering plus free space."""
+    total = 0
+    for i in range(16):
+        rank = (b >> (4 * i)) & 0xF
+        if rank:
+            total += snake[i] << rank
+    free = _free_cells(b)
+    return float(total + FREE_WEIGHT * free * free)
+
+@njit
+def expectimax(b, depth, is_player, left, right, snake, tt):
+    """Expected heuristic value of a position searched depth spawns deep."""
+    if is_player:
+        # Player node: best of the legal moves; no moves means game over
+        best = 0.0
+        for d in range(4):
+            nb = move(b, d, left, right)
+            if nb != b:
+                best = max(best, expectimax(nb, depth, False, left, right, snake, tt))
+        return best
+
+    key = (b, depth)
+    if key in tt:
+        return tt[key]
+
+    if depth == 0:
+        value = score(b, snake)
+    else:
+        # Chance node: a 2 (90%) or a 4 (10%) appears in any empty cell
+        total = 0.0
+        empty = 0
+        for i in range(16):
+            if (b >> (4 * i)) & 0xF == 0:
+                empty += 1
+                total += 0.9 * expectimax(b | (1 << (4 * i)), depth - 1, True, left, right, snake, tt)
+                total += 0.1 * expectimax(b | (2 << (4 * i)), depth - 1, True, left, right, snake, tt)
+        # A legal move always leaves a free cell, but never divide by zero
+        value = total / empty if empty else score(b, snake)
+
+    if len(tt) < TT_MAX_SIZE:
+        tt[key] = value
+    return value
+
+@njit
+def alphabeta(b, depth, alpha, beta, maximizing, left, right, snake):
+    """Minimax value with the tile spawner as an adversary, pruned by alpha-beta."""
+    if depth == 0 and not maximizing:
+        return score(b, snake)
+
+    if maximizing:
+        value = -math.inf
+        for d in range(4):
+            nb = move(b, d, left, right)
+            if nb == b:
+                continue
+            value = max(value, alphabeta(nb, depth, alpha, beta, False, left, right, snake))
+            alpha = max(alpha, value)
+            if beta <= alpha:
+                break
+        return 0.0 if value == -math.inf else value  # No moves means game over
+
+    # Min node: try the most damaging spawns first so cutoffs come early
+    spawns = []
+    values = []
+    for i in range(16):
+        if (b >> (4 * i)) & 0xF == 0:
+            for rank in (1, 2):
+                spawns.append(b | (rank << (4 * i)))
+                values.append(score(spawns[-1], snake))
+                # Insertion sort; there are at most 30 spawns
+                j = len(values) - 1
+                while j > 0 and values[j - 1] > values[j]:
+                    values[j - 1], values[j] = values[j], values[j - 1]
+                    spawns[j - 1], spawns[j] = spawns[j], spawns[j - 1]
+                    j -= 1
+
+    if len(spawns) == 0:
+        return score(b, snake)
+
+    value = math.inf
+    for nb in spawns:
+        value = min(value, alphabeta(nb, depth - 1, alpha, beta, True, left, right, snake))
+        beta = min(beta, value)
+        if beta <= alpha:
+            break
+    return value
+
+@njit
+def _best_move(b, depth, use_alphabeta, left, right, snake, tt):
+    """Index into DIRECTIONS of the best move, or -1 if none is legal."""
+    best = -1
+    best_value = -1.0
+    for d in range(4):
+        nb = move(b, d, left, right)
+        if nb == b:
+            continue
+        if use_alphabeta:
+            value = alphabeta(nb, depth, best_value, math.inf, False, left, right, snake)
+        else:
+            value = expectimax(nb, depth, False, left, right, snake, tt)
+        if value > best_value:
+            best = d
+            best_value = value
+    return best
+
+def _new_table():
+    """Fresh transposition table for one top-level search."""
+    if HAVE_NUMBA:
+        return Dict.empty(key_type=types.UniTuple(types.int64, 2), value_type=types.float64)
+    return {}
+
+def best_move(b, depth, use_alphabeta=False):
+    """Search a bitboard and return the best direction index, or -1."""
+    return _best_move(_native(b), depth, use_alphabeta, LEFT_MOVE, RIGHT_MOVE, SNAKE, _new_table())
+
+def can_move(b, direction):
+    """Check whether sliding in direction changes the board."""
+    b = _native(b)
+    return move(b, direction, LEFT_MOVE, RIGHT_MOVE) != b
+
+def free_cells(b):
+    """Count empty cells on a bitboard."""
+    return _free_cells(_native(b))
@@ -4,9 +4,24 @@ Claude Code Interface - High-level interface for Claude Code to interact with 20
 """
 
 import json
+import re
 from pathlib import Path
-from src.python.gdb_bridge import GDBBridge
-from src.python.analyze_2048_source import SourceAnalyzer
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+from .gdb.bridge import PROMPT, GDBBridge
+from .utils.analyze_2048_source import SourceAnalyzer
+from .ai.bitboard import is_board
+
+try:
+    from orjson import dumps as _dumps
+except ImportError:
+    def _dumps(obj):
+        return json.dumps(obj, separators=(",", ":")).encode()
+
+# "Temporary breakpoint 2 at 0x...: file gfx_curses.c, line 50."
+_TBREAK_RE = re.compile(r'Temporary breakpoint (\d+)')
 
 class ClaudeCodeInterface:
     """
@@ -18,6 +33,12 @@ class ClaudeCodeInterface:
         self.gdb = None
         self.board_address = None
         self.source_analysis = None
+        # Last board read; reused until a move may have changed it
+        self._last_board_values = None
+        self._dirty = True
+        self.draw_function = None
+        # Side-channel boards seen before the last continue (None: no redraw yet)
+        self._channel_seq = None
         
     def analyze_source(self):
         """
@@ -51,17 +72,69 @@ class ClaudeCodeInterface:
         self.gdb = GDBBridge()
         self.gdb.start()
         
-        # Run the game
-        self.gdb.send_command("run")
+        # Moves wait for the next redraw rather than a fixed delay
+        self.draw_function = self._find_draw_function()
+        
+        # Run the game. It sits in its input loop without returning to the
+        # prompt, so stop it there to be able to look at its memory
+        output = self.gdb.send_command("run", timeout=1.0)
+        if not output.endswith(PROMPT.decode()) and not self.gdb.interrupt():
+            return "Error: the game started but could not be stopped"
         
         return "Game started. Use find_board() next."
     
-    def find_board(self, hint_value=None):
+    def _find_draw_function(self):
+        """Pick the game's redraw function, from the source analysis if available."""
+        if self.source_analysis:
+            for func_name in self.source_analysis["functions"]:
+                if "draw" in func_name.lower():
+                    return func_name
+        return "gfx_draw"  # 2048-cli's curses renderer
+    
+    def wait_for_draw(self, timeout=5.0):
+        """Continue the game until it next redraws the board.
+        
+        Returns False if it didn't redraw within timeout; the game is then
+        interrupted again and the last board read is kept.
+        """
+        seq = self.gdb.board_channel_seq
+        if not self._continue_to(self.draw_function, timeout):
+            return False
+        self._channel_seq = seq
+        self._dirty = True
+        return True
+    
+    def _continue_to(self, location, timeout=5.0):
+        """Continue until the game reaches location; on timeout stop it and return False."""
+        # A one-shot breakpoint; `continue` returns once GDB stops on it
+        match = _TBREAK_RE.search(self.gdb.send_command(f"tbreak {location}") or "")
+        output = self.gdb.send_command("continue", timeout=timeout)
+        if not output.endswith(PROMPT.decode()):
+            self.gdb.interrupt()
+            if match:
+                self.gdb.send_command(f"delete {match.group(1)}")
+            return False
+        return True
+    
+    def _send_key(self, key, timeout=5.0):
+        """Make the game's next wgetch() return key."""
+        # Stopped inside a blocking wgetch (e.g. interrupted after run), or
+        # elsewhere (e.g. at the last redraw) and it has to get there first
+        output = self.gdb.send_command("frame function wgetch") or ""
+        if "No frame" in output or "wgetch" not in output:
+            if not self._continue_to("wgetch", timeout):
+                return False
+        # Pops wgetch (and anything it called) as if it had read the key
+        output = self.gdb.send_command(f"with confirm off -- return (int) {ord(key)}") or ""
+        return "#0" in output  # The frame it returned to
+    
+    def find_board(self, hint_value=None, exhaustive=False):
         """
         Step 3: Find the game board in memory.
         
         Args:
             hint_value: A value you see on the board (like 16 or 32) to help narrow search
+            exhaustive: Keep scanning after the first board to list every candidate
         """
         print(f"🔍 Searching for game board{' with hint: ' + str(hint_value) if hint_value else ''}...")
         
@@ -74,12 +147,19 @@ class ClaudeCodeInterface:
         if hint_value:
             # Search for the specific value
             addrs = self.gdb.find_board_pattern([hint_value])
-            for addr in addrs:
-                # Check addresses around it
-                for offset in range(-60, 4, 4):  # Check up to 15 integers before
-                    check_addr = hex(int(addr, 16) + offset)
-                    if self._check_if_board(check_addr):
-                        candidates.append(check_addr)
+            # Check addresses around each hit: the hint can be any of the 16
+            # cells, so read one window covering up to 15 integers before
+            # and slide the 64-byte board over it locally
+            starts = [int(addr, 16) - 60 for addr in addrs]
+            bufs = self.gdb.read_blocks([hex(start) for start in starts], 124)
+            for start, buf in zip(starts, bufs):
+                if buf is None:
+                    continue
+                windows = sliding_window_view(np.frombuffer(buf, dtype="<i4"), 16)
+                for i in np.flatnonzero(is_board(windows)):
+                    candidates.append(hex(start + 4 * int(i)))
+                if candidates and not exhaustive:
+                    break
         
         # Also try common patterns
         patterns = [
@@ -89,13 +169,21 @@ class ClaudeCodeInterface:
         ]
         
         for pattern in patterns:
+            if candidates and not exhaustive:
+                break
             addrs = self.gdb.find_board_pattern(pattern)
-            for addr in addrs:
-                if self._check_if_board(addr):
+            for addr, ok in zip(addrs, self._check_if_boards(addrs)):
+                if ok:
                     candidates.append(addr)
+                    if not exhaustive:
+                        break
         
         if candidates:
             self.board_address = candidates[0]
+            self._dirty = True
+            # Have every redraw push the board to us from now on
+            self.gdb.open_board_channel(self.board_address, self.draw_function)
+            self._channel_seq = None
             return {
                 "found": True,
                 "address": self.board_address,
@@ -109,13 +197,15 @@ class ClaudeCodeInterface:
                 "example": "find_board(hint_value=16)"
             }
     
-    def _check_if_board(self, addr):
-        """Check if an address contains a valid board."""
-        try:
-            values = self.gdb.examine_memory(addr, 16)
-            return self.gdb.verify_board_address(addr)
-        except:
-            return False
+    def _check_if_boards(self, addrs):
+        """Check which of the addresses contain a valid board."""
+        bufs = self.gdb.read_blocks(addrs, 64)
+        readable = [buf is not None for buf in bufs]
+        if not any(readable):
+            return readable
+        cells = np.frombuffer(b"".join(buf for buf in bufs if buf), dtype="<i4")
+        found = iter(is_board(cells.reshape(-1, 16)))
+        return [bool(next(found)) if ok else False for ok in readable]
     
     def read_board(self):
         """
@@ -124,7 +214,17 @@ class ClaudeCodeInterface:
         if not self.board_address:
             return "Error: Find board first with find_board()"
         
-        values = self.gdb.examine_memory(self.board_address, 16)
+        if self._dirty or self._last_board_values is None:
+            # The redraw we stopped at has already sent the board, if the
+            # side channel is open; otherwise dump it
+            values = None
+            if self._channel_seq is not None:
+                values = self.gdb.wait_board_channel(self._channel_seq)
+            if values is None:
+                values = self.gdb.examine_memory(self.board_address, 16)
+            self._last_board_values = values
+            self._dirty = False
+        values = self._last_board_values
         
         # Format as 4x4 grid
         board = []
@@ -144,18 +244,20 @@ class ClaudeCodeInterface:
             "max_tile": max(values) if values else 0
         }
     
-    def make_move(self, direction="auto"):
+    def make_move(self, direction="auto", board_state=None):
         """
         Step 5: Make a move.
         
         Args:
             direction: "up", "down", "left", "right", or "auto" for AI choice
+            board_state: Result of a read_board() the caller already made
         """
         if not self.board_address:
             return "Error: Find board first with find_board()"
         
         # Read current board
-        board_state = self.read_board()
+        if board_state is None:
+            board_state = self.read_board()
         
         if direction == "auto":
             # Simple AI strategy
@@ -174,10 +276,14 @@ class ClaudeCodeInterface:
         # Inject the key at next input
         print(f"🎯 Making move: {direction} (key: {key})")
         
-        # This is simplified - in practice we'd set up proper breakpoint handling
-        self.gdb.send_command(f"call (void)printf(\"\\n\")")  # Trigger refresh
+        if not self._send_key(key):
+            return f"Error: could not send key {key} to the game"
         
-        return f"Move {direction} queued. Board should update soon."
+        # Block until the game has redrawn with the move applied
+        if not self.wait_for_draw():
+            return f"Error: the game did not redraw after move {direction}"
+        
+        return f"Move {direction} made."
     
     def _choose_best_move(self, board):
         """Simple AI to choose move."""
@@ -193,29 +299,17 @@ class ClaudeCodeInterface:
             name: Experiment name
             moves: Number of moves to make
         """
-        results = {
-            "experiment": name,
-            "moves": [],
-            "scores": []
-        }
-        
-        for i in range(moves):
-            board_state = self.read_board()
-            results["moves"].append(board_state)
-            
-            move = self.make_move("auto")
-            print(f"Move {i+1}/{moves}: {move}")
-            
-            # Wait a bit for game to update
-            import time
-            time.sleep(0.5)
-        
-        # Save results
         exp_dir = Path(f"experiments/03-ai-testing/{name}")
         exp_dir.mkdir(parents=True, exist_ok=True)
         
-        with open(exp_dir / "results.json", 'w') as f:
-            json.dump(results, f, indent=2)
+        # Stream one JSON record per move so nothing accumulates in memory
+        with open(exp_dir / "results.jsonl", 'wb') as f:
+            for i in range(moves):
+                board_state = self.read_board()
+                move = self.make_move("auto", board_state=board_state)
+                print(f"Move {i+1}/{moves}: {move}")
+                
+                f.write(_dumps({"i": i, "board": board_state, "move": move}) + b"\n")
         
         return f"Experiment '{name}' complete. Results saved."
 
@@ -4,15 +4,33 @@ External controller that runs GDB as subprocess.
 Works even without Python/Guile support in GDB.
 """
 
+import os
+import signal
 import subprocess
 import time
 import re
 import sys
 
+import numpy as np
+
+from ai.bitboard import is_board
+
+PROMPT = b"(gdb) "
+# Echoed after a script so we know GDB has worked through all of it
+DONE_CMD = "echo ===DONE===\\n"
+DONE = b"===DONE===\n"
+
+_ADDR_RE = re.compile(r'(0x[0-9a-fA-F]+)')
+_HEX_RE = re.compile(r'0x([0-9a-fA-F]+)')
+# One `x/Nwx` row: address, optional <symbol+off>, then the words after the
+# colon; only hex words count, so "Cannot access memory at ..." never matches
+_ROW_RE = re.compile(r'(0x[0-9a-fA-F]+)[^:\n]*:[ \t]*((?:0x[0-9a-fA-F]+[ \t]*){1,4})')
+
 class External2048Controller:
     def __init__(self):
         self.gdb = None
         self.board_address = None
+        self._buf = bytearray()  # GDB output read past the last prompt
         
     def start(self):
         """Start GDB with 2048."""
@@ -22,8 +40,8 @@ class External2048Controller:
             stdin=subprocess.PIPE,
             stdout=subprocess.PIPE,
             stderr=subprocess.STDOUT,
-            text=True,
-            bufsize=0
+            bufsize=-1,
+            start_new_session=True  # Own process group, for interrupt_game
         )
         
         # Wait for GDB prompt
@@ -36,24 +54,53 @@ class External2048Controller:
     def _send_command(self, cmd):
         """Send command to GDB."""
         print(f">>> {cmd}")
-        self.gdb.stdin.write(cmd + "\n")
+        self.gdb.stdin.write(cmd.encode() + b"\n")
+        self.gdb.stdin.flush()
+        
+    def _send_script(self, lines, echo=True):
+        """Send several commands in one write and wait until GDB has run them all."""
+        if echo:
+            for line in lines:
+                print(f">>> {line}")
+        script = "\n".join(lines + [DONE_CMD]) + "\n"
+        self.gdb.stdin.write(script.encode())
         self.gdb.stdin.flush()
+        output = self._read_until(DONE)
+        return output + self._wait_for_prompt()
         
     def _wait_for_prompt(self):
-        """Wait for GDB prompt."""
-        output = ""
+        """Wait for GDB prompt and return everything up to and including it."""
+        return self._read_until(PROMPT)
+        
+    def _read_until(self, marker):
+        """Read GDB output up to and including marker."""
+        fd = self.gdb.stdout.fileno()
+        scanned = 0
         while True:
-            char = self.gdb.stdout.read(1)
-            output += char
-            if output.endswith("(gdb) "):
+            end = self._buf.find(marker, scanned)
+            if end != -1:
+                end += len(marker)
+                break
+            # Only the tail can hold a marker split across two reads
+            scanned = max(0, len(self._buf) - len(marker) + 1)
+            chunk = os.read(fd, 65536)
+            if not chunk:
+                # GDB exited; hand back whatever it said last
+                end = len(self._buf)
                 break
-        return output
+            self._buf += chunk
+        
+        output = bytes(self._buf[:end])
+        del self._buf[:end]
+        return output.decode('utf-8', 'replace')
         
     def interrupt_game(self):
         """Send Ctrl+C to GDB."""
         print("🛑 Interrupting game...")
-        self.gdb.send_signal(subprocess.signal.SIGINT)
-        time.sleep(0.5)
+        # Reaches GDB only (the game runs in a process group of its own);
+        # GDB passes the Ctrl-C on to the game, as with one typed at its terminal
+        os.killpg(os.getpgid(self.gdb.pid), signal.SIGINT)
+        self._wait_for_prompt()
         
     def find_board(self):
         """Find the game board."""
@@ -64,56 +111,51 @@ class External2048Controller:
         output = self._wait_for_prompt()
         
         # Parse addresses
-        addresses = re.findall(r'(0x[0-9a-fA-F]+)', output)
+        addresses = _ADDR_RE.findall(output)
+        if not addresses:
+            return False
         
-        for addr in addresses:
-            # Check if it's a valid board
-            self._send_command(f"x/16wx {addr}")
-            output = self._wait_for_prompt()
-            
-            # Simple check - look for reasonable values
-            if self._looks_like_board(output):
+        # Dump every candidate in one script and check them all at once
+        print(f">>> x/16wx for {len(addresses)} candidates")
+        output = self._send_script([f"x/16wx {addr}" for addr in addresses], echo=False)
+        boards = self._parse_dump(output, [int(addr, 16) for addr in addresses])
+        
+        for addr, ok in zip(addresses, is_board(boards)):
+            if ok:
                 self.board_address = addr
                 print(f"✅ Found board at {addr}")
                 return True
                 
         return False
         
-    def _looks_like_board(self, output):
-        """Check if memory dump looks like a game board."""
-        # Extract values
-        values = re.findall(r'0x([0-9a-fA-F]+)', output)
+    def _parse_dump(self, output, addresses):
+        """Turn `x/16wx` output into an (N, 16) array, one row per address.
         
-        if len(values) < 16:
-            return False
-            
-        # Convert to integers
-        try:
-            ints = [int(v, 16) for v in values[:16]]
-            
-            # Check if values are reasonable
-            zeros = sum(1 for v in ints if v == 0)
-            powers = sum(1 for v in ints if v > 0 and (v & (v-1)) == 0)
-            
-            return zeros > 0 and (zeros + powers) >= 16
-        except:
-            return False
+        Words GDB could not read come back as -1, which no board contains.
+        """
+        words = {}
+        # Not anchored: GDB's prompt precedes the first row of each dump
+        for row, rest in _ROW_RE.findall(output):
+            base = int(row, 16)
+            for i, value in enumerate(_HEX_RE.findall(rest)):
+                words[base + 4 * i] = int(value, 16)
+        
+        return np.array([[words.get(addr + 4 * i, -1) for i in range(16)]
+                         for addr in addresses], dtype=np.int64)
             
     def enable_ai(self):
         """Enable AI control."""
         print("🤖 Enabling AI...")
         
-        # Set breakpoint on input
-        self._send_command("break wgetch")
-        self._wait_for_prompt()
-        
-        # Set commands
-        self._send_command("commands")
-        self._send_command("silent")
-        self._send_command("return 115")  # 's' key - always go down
-        self._send_command("continue")
-        self._send_command("end")
-        self._wait_for_prompt()
+        # Break on input and answer it from the breakpoint commands
+        self._send_script([
+            "break wgetch",
+            "commands",
+            "silent",
+            "return 115",  # 's' key - always go down
+            "continue",
+            "end"
+        ])
         
         print("✅ AI enabled - will always press DOWN")
         
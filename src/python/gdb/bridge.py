@@ -3,19 +3,65 @@
 GDB Bridge - Allows Claude Code to interact with GDB programmatically.
 """
 
+import functools
+import os
+import pickle
+import queue
+import selectors
+import signal
+import struct
 import subprocess
+import tempfile
+import threading
 import time
 import re
 import json
 from pathlib import Path
 
+from ..ai.bitboard import is_board
+from ..utils.analyze_2048_source import SourceAnalyzer
+
+PROMPT = b"(gdb) "
+# Echoed after a script so we know GDB has worked through all of it
+DONE_CMD = "echo ===DONE===\\n"
+DONE = b"===DONE===\n"
+
+_ADDR_RE = re.compile(r'(0x[0-9a-fA-F]+)')
+# "Dprintf 3 at 0x401136: file gfx_curses.c, line 50."
+_DPRINTF_RE = re.compile(r'Dprintf (\d+) at')
+# The words of one `x/Nwx` row (up to four, after the address and colon)
+_ROW_RE = re.compile(r':[ \t]*((?:0x[0-9a-fA-F]+[ \t]*){1,4})')
+# Result record of a tokened MI -data-read-memory-bytes; only the first block
+# matters, since a partial read is treated as a failed one
+_MI_MEMORY_RE = re.compile(
+    r'(\d+)\^done,memory=\[\{begin="0x[0-9a-fA-F]+",offset="0x[0-9a-fA-F]+",'
+    r'end="0x[0-9a-fA-F]+",contents="([0-9a-fA-F]*)"'
+)
+
 class GDBBridge:
     def __init__(self, binary_path="/usr/local/bin/2048"):
         self.binary = binary_path
         self.gdb_process = None
         self.board_address = None
+        self._buf = bytearray()  # GDB output read past the last prompt
+        self._chunks = queue.Queue()  # Raw output from the reader thread
+        self._eof = False
+        # Markers of replies we gave up waiting for; they still arrive, ahead
+        # of the reply to whatever we send next
+        self._owed = []
+        self._token = 0  # Last MI command token handed out
+        # Board side channel (see open_board_channel)
+        self._channel_fd = None
+        self._channel_path = None
+        self._channel_board = None
+        self._channel_seq = 0
+        self._channel_dprintf = None  # Breakpoint number of the dprintf
+        self._channel_where = None  # (address, location) it prints
+        self._channel_cond = threading.Condition()
         self.log_file = Path("logs/gdb_session.log")
         self.log_file.parent.mkdir(exist_ok=True)
+        # Kept open for the whole session; line buffered so the log stays current
+        self._log = open(self.log_file, 'a', buffering=1)
         
     def start(self):
         """Start GDB process."""
@@ -24,48 +70,156 @@ class GDBBridge:
             ["gdb", "-q", self.binary],
             stdin=subprocess.PIPE,
             stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
-            text=True,
-            bufsize=0
+            stderr=subprocess.STDOUT,
+            bufsize=-1,
+            start_new_session=True  # Own process group, for interrupt
         )
-        time.sleep(0.5)
+        threading.Thread(target=self._reader, args=(self.gdb_process.stdout.fileno(),),
+                         daemon=True).start()
+        self._wait_for_prompt()
         
         # Initial setup
         self.send_command("set pagination off")
         self.send_command("set print pretty on")
         
-    def send_command(self, cmd):
-        """Send command to GDB and return output."""
+    def send_command(self, cmd, timeout=5.0):
+        """Send command to GDB and return output.
+        
+        Gives up after timeout seconds without a prompt (e.g. once the
+        program is running) and returns what has arrived so far, which then
+        does not end in PROMPT. The rest of that reply is skipped later.
+        """
         if not self.gdb_process:
             return None
             
-        with open(self.log_file, 'a') as log:
-            log.write(f"\n>>> {cmd}\n")
+        self._log.write(f"\n>>> {cmd}\n")
             
-        self.gdb_process.stdin.write(cmd + "\n")
+        self.gdb_process.stdin.write(cmd.encode() + b"\n")
         self.gdb_process.stdin.flush()
         
-        # Collect output (simple approach - may need refinement)
-        time.sleep(0.1)
         output = ""
+        if self._skip_owed(timeout):
+            output = self._wait_for_prompt(timeout)
+        if not output.endswith(PROMPT.decode()):
+            self._owed.append(PROMPT)
+                
+        self._log.write(output)
+            
+        return output
+    
+    def send_script(self, lines, timeout=5.0):
+        """Send several commands in one write and return their combined output."""
+        if not self.gdb_process:
+            return None
         
-        # Read available output
-        import select
-        while True:
-            ready, _, _ = select.select([self.gdb_process.stdout], [], [], 0.1)
-            if ready:
-                line = self.gdb_process.stdout.readline()
-                output += line
-                if "(gdb)" in line:
-                    break
-            else:
-                break
+        script = "\n".join(lines + [DONE_CMD]) + "\n"
+        self._log.write(f"\n>>> {script}")
+            
+        self.gdb_process.stdin.write(script.encode())
+        self.gdb_process.stdin.flush()
+        
+        output = ""
+        if self._skip_owed(timeout):
+            output = self._read_until(DONE, timeout)
+        if not output.endswith(DONE.decode()):
+            self._owed += [DONE, PROMPT]
+        else:
+            output += self._wait_for_prompt(timeout)
+            if not output.endswith(PROMPT.decode()):
+                self._owed.append(PROMPT)
                 
-        with open(self.log_file, 'a') as log:
-            log.write(output)
+        self._log.write(output)
             
         return output
     
+    def interrupt(self, timeout=5.0):
+        """Stop the running game; True once GDB is back at its prompt."""
+        if not self.gdb_process:
+            return False
+        # Reaches GDB only (the game runs in a process group of its own);
+        # GDB passes the Ctrl-C on to the game, as with one typed at its terminal
+        os.killpg(os.getpgid(self.gdb_process.pid), signal.SIGINT)
+        return self._skip_owed(timeout)
+    
+    def close(self):
+        """Stop GDB and close the session log."""
+        if self.gdb_process:
+            self.gdb_process.terminate()
+            self.gdb_process.wait()
+            self.gdb_process = None
+        if self._channel_fd is not None:
+            os.close(self._channel_fd)
+            os.unlink(self._channel_path)
+            os.rmdir(os.path.dirname(self._channel_path))
+            self._channel_fd = None
+        self._log.close()
+    
+    def _wait_for_prompt(self, timeout=None):
+        """Read GDB output up to and including the next prompt."""
+        return self._read_until(PROMPT, timeout)
+    
+    def _skip_owed(self, timeout=None):
+        """Read past the replies of commands that timed out.
+        
+        Returns False if one still hasn't finished, e.g. the game is running;
+        GDB then hasn't started on anything sent after it either.
+        """
+        while self._owed:
+            marker = self._owed[0]
+            stale = self._read_until(marker, timeout)
+            self._log.write(stale)
+            if not stale.endswith(marker.decode()):
+                return False
+            self._owed.pop(0)
+        return True
+    
+    def _reader(self, fd):
+        """Move GDB's output onto self._chunks as it arrives (own thread).
+        
+        Callers only ever block on the queue, so waiting for GDB never
+        holds up other threads, e.g. concurrent web requests.
+        """
+        with selectors.DefaultSelector() as sel:
+            sel.register(fd, selectors.EVENT_READ)
+            while True:
+                sel.select()
+                chunk = os.read(fd, 65536)
+                self._chunks.put(chunk)
+                if not chunk:
+                    break  # GDB exited
+    
+    def _read_until(self, marker, timeout=None):
+        """Read GDB output up to and including marker."""
+        scanned = 0
+        while True:
+            end = self._buf.find(marker, scanned)
+            if end != -1:
+                end += len(marker)
+                break
+            # Only the tail can hold a marker split across two reads
+            scanned = max(0, len(self._buf) - len(marker) + 1)
+            chunk = b""
+            if not self._eof:
+                try:
+                    chunk = self._chunks.get(timeout=timeout)
+                    self._eof = not chunk  # The reader's last word
+                except queue.Empty:
+                    pass
+            if not chunk:
+                # Timed out or GDB exited; hand back what we have, except
+                # the start of a marker whose end is still on its way
+                end = len(self._buf)
+                for k in range(min(len(marker) - 1, end), 0, -1):
+                    if self._buf.endswith(marker[:k]):
+                        end -= k
+                        break
+                break
+            self._buf += chunk
+        
+        output = bytes(self._buf[:end])
+        del self._buf[:end]
+        return output.decode('utf-8', 'replace')
+    
     def find_board_pattern(self, pattern):
         """Search memory for a board pattern."""
         print(f"🔍 Searching for pattern: {pattern}")
@@ -80,7 +234,7 @@ class GDBBridge:
         addresses = []
         for line in output.split('\n'):
             if "0x" in line:
-                match = re.search(r'(0x[0-9a-fA-F]+)', line)
+                match = _ADDR_RE.search(line)
                 if match:
                     addresses.append(match.group(1))
         
@@ -89,19 +243,129 @@ class GDBBridge:
     def examine_memory(self, address, count=16):
         """Examine memory at address."""
         cmd = f"x/{count}wx {address}"
-        output = self.send_command(cmd)
+        output = self.send_command(cmd) or ""
         
-        # Parse values
-        values = []
-        for line in output.split('\n'):
-            if "0x" in line and ":" in line:
-                # Extract hex values after the colon
-                parts = line.split(':')[1].strip().split()
-                for part in parts:
-                    if part.startswith('0x'):
-                        values.append(int(part, 16))
+        # GDB prints each word as its value, so the digits read big-endian
+        words = [tok[2:].zfill(8) for row in _ROW_RE.findall(output) for tok in row.split()]
+        return list(struct.unpack(f">{len(words)}I", bytes.fromhex("".join(words))))
+    
+    def read_bytes(self, address, length):
+        """Read raw inferior memory, or None if it can't be read."""
+        return self.read_blocks([address], length)[0]
+    
+    def read_blocks(self, addresses, length):
+        """Read length bytes at each address in one pipelined round trip.
+        
+        Each read is a tokened MI -data-read-memory-bytes run through
+        interpreter-exec, so the session stays on the CLI while replies are
+        structured records matched back to their address by token. Returns
+        a list of bytes in address order, with None for unreadable blocks.
+        """
+        tokens = []
+        script = []
+        for address in addresses:
+            self._token += 1
+            tokens.append(self._token)
+            script.append(f'interpreter-exec mi "{self._token}-data-read-memory-bytes {address} {length}"')
+        
+        output = self.send_script(script) if script else None
+        blocks = {}
+        for token, contents in _MI_MEMORY_RE.findall(output or ""):
+            if len(contents) == 2 * length:
+                blocks[int(token)] = bytes.fromhex(contents)
+        return [blocks.get(token) for token in tokens]
+    
+    def open_board_channel(self, address, location):
+        """Have the game print the board to a FIFO every time location is hit.
+        
+        A dprintf (which never stops the game) calls fprintf in the inferior
+        on a stream opened on our FIFO, so boards arrive out of band: no
+        command, no prompt, no dump to parse. The inferior must be stopped.
+        Calling it again with another address moves the dprintf there.
+        Returns False if the stream or the dprintf could not be set up.
+        """
+        if self._channel_fd is not None:
+            return self._set_board_dprintf(address, location)
+        
+        path = os.path.join(tempfile.mkdtemp(prefix="gdb-2048-"), "board.pipe")
+        os.mkfifo(path)
+        # Open our end first (non-blocking) so the game's fopen doesn't hang
+        fd = os.open(path, os.O_RDONLY | os.O_NONBLOCK)
         
-        return values
+        output = self.send_script([
+            f'set $board_fp = (void *) fopen("{path}", "w")',
+            'print $board_fp != 0'
+        ])
+        if not output or "= 1" not in output:
+            os.close(fd)
+            os.unlink(path)
+            os.rmdir(os.path.dirname(path))
+            return False
+        
+        self.send_script([
+            'call (int) setvbuf($board_fp, 0, 1, 0)',  # _IOLBF: one write per board
+            'set dprintf-style call',
+            'set dprintf-function fprintf',
+            'set dprintf-channel $board_fp'
+        ])
+        
+        os.set_blocking(fd, True)
+        self._channel_fd = fd
+        self._channel_path = path
+        threading.Thread(target=self._read_board_channel, args=(fd,), daemon=True).start()
+        return self._set_board_dprintf(address, location)
+    
+    def _set_board_dprintf(self, address, location):
+        """Make the channel's dprintf print the board at address, replacing an old one."""
+        if self._channel_where == (address, location):
+            return True
+        if self._channel_dprintf is not None:
+            # Still printing the old address; its boards would look current
+            self.send_command(f"delete {self._channel_dprintf}")
+            self._channel_dprintf = None
+            self._channel_where = None
+        
+        fmt = " ".join(["%d"] * 16) + "\\n"
+        cells = ",".join(f"((int *) {address})[{i}]" for i in range(16))
+        match = _DPRINTF_RE.search(self.send_command(f'dprintf {location},"{fmt}",{cells}') or "")
+        if not match:
+            return False
+        self._channel_dprintf = match.group(1)
+        self._channel_where = (address, location)
+        return True
+    
+    def _read_board_channel(self, fd):
+        """Keep the latest board written to the side channel."""
+        pending = b""
+        while True:
+            try:
+                chunk = os.read(fd, 4096)
+            except OSError:
+                break  # Closed by close()
+            if not chunk:
+                break  # The game exited
+            pending += chunk
+            *lines, pending = pending.split(b"\n")
+            if not lines:
+                continue
+            with self._channel_cond:
+                self._channel_board = [int(v) for v in lines[-1].split()]
+                self._channel_seq += 1
+                self._channel_cond.notify_all()
+    
+    @property
+    def board_channel_seq(self):
+        """How many boards have arrived on the side channel so far."""
+        return self._channel_seq
+    
+    def wait_board_channel(self, seq, timeout=0.5):
+        """Latest side-channel board once more than seq have arrived, else None."""
+        if self._channel_fd is None:
+            return None
+        with self._channel_cond:
+            if not self._channel_cond.wait_for(lambda: self._channel_seq > seq, timeout):
+                return None
+            return self._channel_board
     
     def verify_board_address(self, address):
         """Verify if address contains a valid game board."""
@@ -110,35 +374,23 @@ class GDBBridge:
         if len(values) != 16:
             return False
             
-        # Check if it looks like a game board
-        # - All values should be 0 or powers of 2
-        # - Should have some zeros (empty cells)
-        # - Should have some non-zeros (tiles)
-        
-        zeros = sum(1 for v in values if v == 0)
-        powers_of_2 = sum(1 for v in values if v > 0 and (v & (v-1)) == 0)
-        
-        return zeros > 0 and zeros < 16 and (zeros + powers_of_2) == 16
+        # All 0 or powers of 2, with some empty cells and some tiles
+        return bool(is_board(values))
     
     def set_ai_breakpoint(self):
         """Set breakpoint for AI intervention."""
         print("🎯 Setting AI breakpoint...")
         
-        # Set breakpoint on input function
-        self.send_command("break wgetch")
-        
-        # Add commands to call our AI
-        commands = [
+        # Break on input and add commands to call our AI
+        self.send_script([
+            "break wgetch",
             "commands",
             "silent",
             "python",
             "# AI will be called here",
             "end",
             "end"
-        ]
-        
-        for cmd in commands:
-            self.send_command(cmd)
+        ])
 
 class Experiment:
     """Base class for experiments."""
@@ -207,6 +459,25 @@ class FindBoardExperiment(Experiment):
         self.results["search_results"] = found_addresses
         self.save_results()
 
+# Source analysis is deterministic, so it is kept on disk between runs
+ANALYSIS_CACHE = Path("cache/source.pkl")
+
+@functools.lru_cache(maxsize=None)
+def _analysis():
+    """Return the source analysis, from the pickle cache if it is up to date."""
+    analyzer = SourceAnalyzer()
+    newest = max((p.stat().st_mtime for p in analyzer.source_dir.glob("src/*.[ch]")), default=0)
+    
+    if ANALYSIS_CACHE.exists() and ANALYSIS_CACHE.stat().st_mtime > newest:
+        with open(ANALYSIS_CACHE, 'rb') as f:
+            return pickle.load(f)
+    
+    results = analyzer.analyze_all()
+    ANALYSIS_CACHE.parent.mkdir(exist_ok=True)
+    with open(ANALYSIS_CACHE, 'wb') as f:
+        pickle.dump(results, f)
+    return results
+
 # Main experiment runner
 def run_experiments():
     """Run all experiments."""
@@ -214,9 +485,7 @@ def run_experiments():
     print("=" * 50)
     
     # First analyze source
-    from analyze_2048_source import SourceAnalyzer
-    analyzer = SourceAnalyzer()
-    source_results = analyzer.analyze_all()
+    source_results = _analysis()
     
     # Start GDB
     bridge = GDBBridge()
@@ -227,10 +496,15 @@ def run_experiments():
         FindBoardExperiment(),
     ]
     
-    for exp in experiments:
-        exp.run(bridge)
+    try:
+        for exp in experiments:
+            exp.run(bridge)
+    finally:
+        bridge.close()
         
     print("\n✅ Experiments complete! Check experiments/ directory for results.")
 
+# Run from the repository root as a module (the relative imports need the
+# package): python -m src.python.gdb.bridge
 if __name__ == "__main__":
     run_experiments()
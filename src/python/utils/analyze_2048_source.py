@@ -9,17 +9,48 @@ import re
 import json
 from pathlib import Path
 
+from pycparser import c_ast, c_generator, parse_file
+from pycparser.c_parser import ParseError
+
+try:
+    import re2  # google-re2: linear-time DFA matching, no backtracking
+except ImportError:
+    re2 = re
+
+# Patterns used by the extractors, compiled once at import time
+_STRUCT_RE = re.compile(r'struct\s+(\w+)\s*\{([^}]+)\}', re.DOTALL)
+# The field pattern runs over every struct body, so use RE2 when available
+_FIELD_RE = re2.compile(r'(\w+)\s+(\w+)(?:\[([^\]]+)\])?(?:\[([^\]]+)\])?;')
+_DEFINE_RE = re.compile(r'#define\s+(BOARD_\w+|SIZE\w*)\s+(\d+)')
+_FUNC_RE = re.compile(r'(\w+\s+\*?\s*)(\w+)\s*\([^)]*\)\s*\{')
+
+# Strip the GNU extensions in system headers that pycparser cannot parse
+_CPP_ARGS = [
+    '-E',
+    '-D__attribute__(x)=',
+    '-D__extension__=',
+    '-D__asm__(x)=',
+    '-D__restrict=',
+    '-D__inline=inline',
+    '-D__builtin_va_list=int',
+]
+
 class SourceAnalyzer:
     def __init__(self, source_dir="2048-source"):
         self.source_dir = Path(source_dir)
         self.structures = {}
         self.globals = {}
         self.key_functions = {}
+        self._sources = None
         
     def analyze_all(self):
         """Run all analysis steps."""
         print("🔍 Analyzing 2048-cli source code...")
         
+        # Read every .c file once; all extractors share the cached text
+        self._sources = None
+        self.sources()
+        
         # Find main structures
         self.find_structures()
         self.find_globals()
@@ -39,24 +70,25 @@ class SourceAnalyzer:
             
         return results
     
+    def sources(self):
+        """Return {path: content} for the C sources, reading them on first use."""
+        if self._sources is None:
+            self._sources = {p: p.read_text() for p in self.source_dir.glob("src/*.c")}
+        return self._sources
+    
     def find_structures(self):
         """Find struct definitions."""
         print("📊 Finding structures...")
         
-        for c_file in self.source_dir.glob("src/*.c"):
-            with open(c_file, 'r') as f:
-                content = f.read()
-                
+        for c_file, content in self.sources().items():
             # Find struct definitions
-            struct_pattern = r'struct\s+(\w+)\s*\{([^}]+)\}'
-            for match in re.finditer(struct_pattern, content, re.DOTALL):
+            for match in _STRUCT_RE.finditer(content):
                 struct_name = match.group(1)
                 struct_body = match.group(2)
                 
                 # Parse fields
                 fields = []
-                field_pattern = r'(\w+)\s+(\w+)(?:\[([^\]]+)\])?(?:\[([^\]]+)\])?;'
-                for field in re.finditer(field_pattern, struct_body):
+                for field in _FIELD_RE.finditer(struct_body):
                     field_info = {
                         "type": field.group(1),
                         "name": field.group(2),
@@ -82,39 +114,38 @@ class SourceAnalyzer:
             if "board" in content.lower() or "game" in content.lower():
                 print(f"  Found relevant header: {h_file.name}")
                 # Extract #defines for board size
-                for match in re.finditer(r'#define\s+(BOARD_\w+|SIZE\w*)\s+(\d+)', content):
+                for match in _DEFINE_RE.finditer(content):
                     print(f"    {match.group(1)} = {match.group(2)}")
     
     def find_globals(self):
         """Find global variables."""
         print("🌐 Finding global variables...")
         
-        for c_file in self.source_dir.glob("src/*.c"):
-            with open(c_file, 'r') as f:
-                content = f.read()
-            
-            # Find globals (simplified - looks for common patterns)
-            # Look for declarations outside functions
-            lines = content.split('\n')
-            in_function = False
-            brace_count = 0
+        generator = c_generator.CGenerator()
+        cpp_args = _CPP_ARGS + [f"-I{self.source_dir / 'src'}"]
+        
+        for c_file in self.sources():
+            try:
+                ast = parse_file(str(c_file), use_cpp=True, cpp_args=cpp_args)
+            except (ParseError, RuntimeError) as e:
+                print(f"  Could not parse {c_file.name}: {e}")
+                continue
             
-            for line in lines:
-                # Track if we're in a function
-                brace_count += line.count('{') - line.count('}')
-                if '{' in line and '(' in line:
-                    in_function = True
-                elif brace_count == 0:
-                    in_function = False
+            # Top-level declarations are file scope by construction; skip
+            # prototypes and anything pulled in from headers
+            for node in ast.ext:
+                if not isinstance(node, c_ast.Decl) or not node.name:
+                    continue
+                if isinstance(node.type, c_ast.FuncDecl):
+                    continue
+                if Path(node.coord.file).name != c_file.name:
+                    continue
                 
-                # Look for variable declarations outside functions
-                if not in_function and brace_count == 0:
-                    # Common patterns for game state
-                    if any(keyword in line for keyword in ['board', 'game', 'score', 'grid']):
-                        if 'int' in line or 'long' in line or 'struct' in line:
-                            print(f"  Potential global in {c_file.name}: {line.strip()}")
-                            self.globals[c_file.name] = self.globals.get(c_file.name, [])
-                            self.globals[c_file.name].append(line.strip())
+                # Common patterns for game state
+                if any(keyword in node.name.lower() for keyword in ['board', 'game', 'score', 'grid']):
+                    decl = generator.visit(node) + ";"
+                    print(f"  Potential global in {c_file.name}: {decl}")
+                    self.globals.setdefault(c_file.name, []).append(decl)
     
     def find_key_functions(self):
         """Find key game functions."""
@@ -122,13 +153,9 @@ class SourceAnalyzer:
         
         important_funcs = ['main', 'init', 'move', 'merge', 'add', 'draw', 'input', 'getch', 'score']
         
-        for c_file in self.source_dir.glob("src/*.c"):
-            with open(c_file, 'r') as f:
-                content = f.read()
-            
+        for c_file, content in self.sources().items():
             # Find function definitions
-            func_pattern = r'(\w+\s+\*?\s*)(\w+)\s*\([^)]*\)\s*\{'
-            for match in re.finditer(func_pattern, content):
+            for match in _FUNC_RE.finditer(content):
                 func_name = match.group(2)
                 return_type = match.group(1).strip()
                 
@@ -145,11 +172,8 @@ class SourceAnalyzer:
         print("💾 Analyzing memory layout...")
         
         # Look specifically for the game board
-        for c_file in self.source_dir.glob("src/*.c"):
+        for c_file, content in self.sources().items():
             if 'engine' in c_file.name or 'game' in c_file.name:
-                with open(c_file, 'r') as f:
-                    content = f.read()
-                
                 # Look for 4x4 arrays or 16-element arrays
                 if '4][4]' in content or '[16]' in content:
                     print(f"  Found board definition in {c_file.name}")
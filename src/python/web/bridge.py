@@ -1,69 +1,240 @@
 #!/usr/bin/env python3
 """
 GDB Web Bridge - Allows Claude Code to interact with GDB via HTTP
+
+Runs under waitress when it is installed. With gunicorn, use a single
+worker so there is one GDB: gunicorn -w 1 -k gthread --threads 8 web.bridge:app
 """
 
-from flask import Flask, request, jsonify
+from flask import Flask, Response, request, jsonify
+import json
+import os
+import signal
 import subprocess
 import threading
 import queue
-import time
 import re
+from pathlib import Path
 
 app = Flask(__name__)
 
+PROMPT = b"(gdb) "
+# The GDB-side AI (same as 2048-ai.py at the repo root), loaded at GDB startup
+AI_SCRIPT = Path(__file__).resolve().parent.parent / "ai" / "basic_ai.py"
+
+_DIGITS_RE = re.compile(r'\d+')
+# One row of the board the AI prints on every move: "|    2|     |    4|     |"
+_BOARD_ROW_RE = re.compile(r'^\|((?:[ \d]{5}\|){4})$')
+# /move directions -> GDB command returning the key code (w/s/a/d) from getch
+_MOVE_CMD = {
+    'up': "return (int)119",
+    'down': "return (int)115",
+    'left': "return (int)97",
+    'right': "return (int)100",
+}
+# Commands (and their usual abbreviations) that let the program run, so GDB
+# may not get back to its prompt for a long time
+_RESUME_CMDS = {
+    'r', 'run', 'start', 'starti', 'c', 'cont', 'continue', 'fg',
+    'n', 'next', 's', 'step', 'ni', 'nexti', 'si', 'stepi',
+    'fin', 'finish', 'u', 'until', 'advance', 'j', 'jump', 'signal',
+}
+
+def _resumes(cmd):
+    """Whether cmd lets the program run (see _RESUME_CMDS)."""
+    words = cmd.split(maxsplit=1)
+    return bool(words) and words[0] in _RESUME_CMDS
+
 class GDBController:
     def __init__(self):
         self.process = None
         self.output_queue = queue.Queue()
         self.board_address = None
+        # Last board the AI printed, replaced (never mutated) on every move
+        self.latest_board = None
+        self.board_changed = threading.Condition()
+        self._board_rows = []
+        # One exchange with GDB at a time; HTTP handlers run in parallel
+        self._lock = threading.Lock()
+        # Prompts of commands that timed out; they still arrive, ahead of
+        # the replies to whatever is sent next
+        self._owed = 0
         
     def start(self, binary="/usr/local/bin/2048"):
-        """Start GDB process."""
+        """Start GDB process, unless it is already running."""
+        with self._lock:
+            return self._start(binary)
+    
+    def _start(self, binary):
+        """start() with the lock held."""
+        if self.process and self.process.poll() is None:
+            return {"status": "already running", "pid": self.process.pid}
+        
+        # -x loads the Python AI during GDB's own startup
         self.process = subprocess.Popen(
-            ["gdb", "-q", binary],
+            ["gdb", "-q", "-x", str(AI_SCRIPT), binary],
             stdin=subprocess.PIPE,
             stdout=subprocess.PIPE,
             stderr=subprocess.STDOUT,
-            text=True,
-            bufsize=0
+            bufsize=-1,
+            start_new_session=True  # Own process group, for /break
         )
         
         # Start output reader thread
+        self.output_queue = queue.Queue()
+        self._owed = 0
         threading.Thread(target=self._read_output, daemon=True).start()
-        
-        # Load Python AI
-        self.send_command("source 2048-ai.py")
+        self._collect_output(timeout=30)  # Startup banner up to the first prompt
         
         return {"status": "started", "pid": self.process.pid}
     
     def _read_output(self):
-        """Read GDB output in background."""
-        while self.process and self.process.poll() is None:
-            line = self.process.stdout.readline()
-            if line:
-                self.output_queue.put(line.strip())
+        """Read GDB output in background.
+        
+        Queues ("LINE", text) for each output line and ("DONE", lines) when
+        GDB prints its prompt, i.e. when the current command has finished.
+        """
+        fd = self.process.stdout.fileno()
+        pending = b""
+        lines = []
+        while True:
+            chunk = os.read(fd, 65536)
+            if not chunk:
+                break
+            pending += chunk
+            # The prompt has no newline, and the next command's output
+            # follows it on the same line, so split on prompts first
+            *finished, pending = pending.split(PROMPT)
+            for part in finished:
+                raws = part.split(b"\n")
+                if not raws[-1]:
+                    raws.pop()
+                self._queue_lines(raws, lines)
+                self.output_queue.put(("DONE", lines))
+                lines = []
+            *complete, pending = pending.split(b"\n")
+            self._queue_lines(complete, lines)
     
-    def send_command(self, cmd):
-        """Send command to GDB."""
+    def _queue_lines(self, raws, lines):
+        """Decode raw output lines, queue them and collect them into lines."""
+        for raw in raws:
+            line = raw.decode('utf-8', 'replace').strip()
+            lines.append(line)
+            self.output_queue.put(("LINE", line))
+            self._track_board(line)
+    
+    def _track_board(self, line):
+        """Pick up boards printed by the AI and wake /board/stream listeners."""
+        match = _BOARD_ROW_RE.match(line)
+        if not match:
+            self._board_rows = []
+            return
+        
+        cells = match.group(1).split('|')[:4]
+        self._board_rows.append([int(c) if c.strip() else 0 for c in cells])
+        if len(self._board_rows) == 4:
+            with self.board_changed:
+                self.latest_board = self._board_rows
+                self.board_changed.notify_all()
+            self._board_rows = []
+    
+    def send_command(self, cmd, timeout=30):
+        """Send command to GDB and wait for its prompt.
+        
+        Commands that leave the program running (run, continue) only get
+        their prompt back once it stops; after timeout seconds the output
+        so far is returned with "timeout" set.
+        """
         if not self.process:
             return {"error": "GDB not running"}
+        return self.send_batch([cmd], timeout)[0]
+    
+    def send_batch(self, cmds, timeout=30):
+        """Send several commands in one write and return one result per command.
+        
+        GDB answers each command with its own prompt, which is how the
+        output is split up again. A command that times out ends the batch.
+        Commands after one that resumes the program are only written once
+        GDB is back at its prompt, so a timeout never leaves any queued.
+        """
+        with self._lock:
+            return self._send_batch(cmds, timeout)
+    
+    def _send_batch(self, cmds, timeout):
+        """send_batch() with the lock held."""
+        if not self._skip_owed(timeout):
+            # The program is still running, so GDB would not read these yet
+            return [{"command": cmds[0], "output": [], "timeout": True}] if cmds else []
+        # Drop output that belongs to no command, e.g. from a running game
+        while True:
+            try:
+                self.output_queue.get_nowait()
+            except queue.Empty:
+                break
             
-        self.process.stdin.write(cmd + "\n")
-        self.process.stdin.flush()
+        results = []
+        pending = list(cmds)
+        while pending:
+            # Up to and including the next command that resumes the program
+            n = next((i + 1 for i, cmd in enumerate(pending) if _resumes(cmd)), len(pending))
+            chunk, pending = pending[:n], pending[n:]
+            
+            self.process.stdin.write("".join(f"{cmd}\n" for cmd in chunk).encode())
+            self.process.stdin.flush()
+            
+            for cmd in chunk:
+                output, done = self._collect_output(timeout)
+                if not done:
+                    self._owed += 1
+                    results.append({"command": cmd, "output": output, "timeout": True})
+                    return results
+                results.append({"command": cmd, "output": output})
+        return results
+    
+    def interrupt(self, timeout=5):
+        """Stop the game and wait for GDB to come back to its prompt."""
+        if not self.process:
+            return {"error": "GDB not running"}
         
-        # Collect output
-        output = []
-        time.sleep(0.5)  # Give GDB time to respond
+        # Reaches GDB only (the game runs in a process group of its own);
+        # GDB passes the Ctrl-C on to the game, as with one typed at its terminal
+        os.killpg(os.getpgid(self.process.pid), signal.SIGINT)
+        if not self._lock.acquire(blocking=False):
+            # A command (e.g. continue) is waiting on GDB; the stop ends it
+            return {"status": "interrupted"}
+        try:
+            output, done = self._collect_output(timeout)
+            if done and self._owed:
+                self._owed -= 1
+        finally:
+            self._lock.release()
+        if not done:
+            return {"status": "interrupt sent", "output": output, "timeout": True}
+        return {"status": "interrupted", "output": output}
+    
+    def _skip_owed(self, timeout):
+        """Read past the prompts still owed; False if one hasn't come in time."""
+        while self._owed:
+            _, done = self._collect_output(timeout)
+            if not done:
+                return False
+            self._owed -= 1
+        return True
+    
+    def _collect_output(self, timeout):
+        """Collect queued lines until GDB is back at its prompt.
         
-        while not self.output_queue.empty():
+        Returns (lines, done); done is False if timeout ran out first.
+        """
+        output = []
+        while True:
             try:
-                line = self.output_queue.get_nowait()
-                output.append(line)
+                kind, payload = self.output_queue.get(timeout=timeout)
             except queue.Empty:
-                break
-                
-        return {"command": cmd, "output": output}
+                return output, False
+            if kind == "DONE":
+                return output, True
+            output.append(payload)
     
     def get_board(self):
         """Get current board state."""
@@ -73,7 +244,7 @@ class GDBController:
         board_str = " ".join(result.get("output", []))
         
         # Extract numbers from the output
-        numbers = re.findall(r'\d+', board_str)
+        numbers = _DIGITS_RE.findall(board_str)
         
         if len(numbers) >= 16:
             board = [int(n) for n in numbers[:16]]
@@ -102,19 +273,26 @@ def send_command():
     cmd = data.get('command', '')
     return jsonify(gdb.send_command(cmd))
 
+@app.route('/batch', methods=['POST'])
+def send_batch():
+    """Send several GDB commands in one round trip."""
+    if not gdb.process:
+        return jsonify({"error": "GDB not running"})
+    data = request.json
+    cmds = data.get('commands', [])
+    # A resuming command can hold the batch up to timeout seconds
+    return jsonify({"results": gdb.send_batch(cmds, data.get('timeout', 30))})
+
 @app.route('/run', methods=['POST'])
 def run_game():
     """Start the game."""
-    return jsonify(gdb.send_command("run"))
+    # No prompt comes back while the game runs, so don't wait long for one
+    return jsonify(gdb.send_command("run", timeout=1))
 
 @app.route('/break', methods=['POST'])
 def break_execution():
     """Send interrupt signal."""
-    if gdb.process:
-        gdb.process.send_signal(subprocess.signal.SIGINT)
-        time.sleep(0.5)
-        return jsonify({"status": "interrupted"})
-    return jsonify({"error": "GDB not running"})
+    return jsonify(gdb.interrupt())
 
 @app.route('/find-board', methods=['POST'])
 def find_board():
@@ -126,29 +304,40 @@ def get_board():
     """Get current board state."""
     return jsonify(gdb.get_board())
 
+@app.route('/board/stream', methods=['GET'])
+def stream_board():
+    """Stream each new board as a Server-Sent Event while the AI plays."""
+    def generate():
+        last = None
+        while True:
+            with gdb.board_changed:
+                gdb.board_changed.wait_for(lambda: gdb.latest_board is not last, timeout=15)
+                board = gdb.latest_board
+            if board is last:
+                # Comment line, so a client that went away is noticed
+                yield ": keep-alive\n\n"
+                continue
+            last = board
+            yield f"data: {json.dumps({'board': board})}\n\n"
+    
+    return Response(generate(), mimetype='text/event-stream')
+
 @app.route('/move', methods=['POST'])
 def make_move():
     """Make a move."""
     data = request.json
     direction = data.get('direction', 'auto')
     
-    # Map directions to keys
-    moves = {
-        'up': 'w',
-        'down': 's',
-        'left': 'a',
-        'right': 'd',
-        'auto': 'auto'
-    }
-    
     if direction == 'auto':
         # Use AI to decide
         gdb.send_command("python move = ai.choose_move()")
         return jsonify({"status": "AI choosing move"})
-    else:
-        key = moves.get(direction, 's')
-        gdb.send_command(f"return (int){ord(key)}")
-        return jsonify({"status": f"moved {direction}"})
+
+    cmd = _MOVE_CMD.get(direction)
+    if cmd is None:
+        return jsonify({"error": "bad direction"}), 400
+    gdb.send_command(cmd)
+    return jsonify({"status": f"moved {direction}"})
 
 @app.route('/ai-enable', methods=['POST'])
 def enable_ai():
@@ -158,7 +347,7 @@ def enable_ai():
 @app.route('/continue', methods=['POST'])
 def continue_execution():
     """Continue execution."""
-    return jsonify(gdb.send_command("continue"))
+    return jsonify(gdb.send_command("continue", timeout=1))
 
 @app.route('/status', methods=['GET'])
 def get_status():
@@ -167,19 +356,30 @@ def get_status():
         return jsonify({"status": "running", "pid": gdb.process.pid})
     return jsonify({"status": "not running"})
 
+def serve(host='127.0.0.1', port=5000):
+    """Serve the API with waitress, or Flask's threaded server without it."""
+    try:
+        from waitress import serve as waitress_serve
+    except ImportError:
+        app.run(host=host, port=port, threaded=True)
+    else:
+        waitress_serve(app, host=host, port=port)
+
 if __name__ == '__main__':
     print("🌐 GDB Web Bridge")
     print("=" * 40)
     print("API Endpoints:")
     print("  POST /start        - Start GDB with 2048")
+    print("  POST /batch        - Run several commands at once")
     print("  POST /run          - Run the game")
     print("  POST /break        - Interrupt execution")
     print("  POST /find-board   - Find game board")
     print("  GET  /board        - Get current board")
+    print("  GET  /board/stream - Stream boards as the AI plays")
     print("  POST /move         - Make a move")
     print("  POST /ai-enable    - Enable AI")
     print("  POST /continue     - Continue execution")
     print("  GET  /status       - Get GDB status")
     print("\nStarting server on http://localhost:5000")
     
-    app.run(debug=True, port=5000)
+    serve(port=5000)
@@ -3,53 +3,73 @@
 Client for Claude Code to interact with GDB Web Bridge
 """
 
+import asyncio
 import requests
 import json
 import time
 
+try:
+    import httpx
+except ImportError:
+    httpx = None
+
 class GDB2048Client:
     def __init__(self, base_url="http://localhost:5000"):
         self.base_url = base_url
+        # One keep-alive connection for every call instead of one per request
+        self.session = requests.Session()
         
     def start(self):
         """Start GDB with 2048."""
-        r = requests.post(f"{self.base_url}/start")
+        r = self.session.post(f"{self.base_url}/start")
         return r.json()
     
     def run(self):
         """Run the game."""
-        r = requests.post(f"{self.base_url}/run")
+        r = self.session.post(f"{self.base_url}/run")
         return r.json()
     
     def interrupt(self):
         """Interrupt the game."""
-        r = requests.post(f"{self.base_url}/break")
+        r = self.session.post(f"{self.base_url}/break")
         return r.json()
     
     def find_board(self):
         """Find the board in memory."""
-        r = requests.post(f"{self.base_url}/find-board")
+        r = self.session.post(f"{self.base_url}/find-board")
         return r.json()
     
     def get_board(self):
         """Get current board state."""
-        r = requests.get(f"{self.base_url}/board")
+        r = self.session.get(f"{self.base_url}/board")
         return r.json()
     
+    def stream_board(self):
+        """Yield each new board (4x4 lists) as the AI plays."""
+        with self.session.get(f"{self.base_url}/board/stream", stream=True) as r:
+            for line in r.iter_lines(decode_unicode=True):
+                if line and line.startswith("data: "):
+                    yield json.loads(line[len("data: "):])["board"]
+    
     def move(self, direction="auto"):
         """Make a move."""
-        r = requests.post(f"{self.base_url}/move", 
-                         json={"direction": direction})
+        r = self.session.post(f"{self.base_url}/move", 
+                              json={"direction": direction})
         return r.json()
     
     def enable_ai(self):
         """Enable AI auto-play."""
-        r = requests.post(f"{self.base_url}/ai-enable")
+        r = self.session.post(f"{self.base_url}/ai-enable")
         return r.json()
     
     def continue_execution(self):
         """Continue game execution."""
-        r = requests.post(f"{self.base_url}/continue")
+        r = self.session.post(f"{self.base_url}/continue")
+        return r.json()
+    
+    def batch(self, commands, timeout=30):
+        """Run several GDB commands in one round trip, waiting up to timeout seconds for each."""
+        r = self.session.post(f"{self.base_url}/batch", json={"commands": commands, "timeout": timeout})
         return r.json()
     
     def play_game(self, moves=50):
@@ -80,29 +100,58 @@ class GDB2048Client:
         print("AI is playing...")
         self.continue_execution()
         
-        # Monitor progress
-        for i in range(moves):
-            time.sleep(1)
-            try:
-                board = self.get_board()
-                if "board" in board:
-                    print(f"\nMove {i+1}:")
-                    self.print_board(board["board"])
-            except:
-                pass
+        # Monitor progress as the bridge pushes each new board
+        for i, board in enumerate(self.stream_board()):
+            print(f"\nMove {i+1}:")
+            self.print_board(board)
+            if i + 1 >= moves:
+                break
+    
+    async def play_game_async(self, moves=50):
+        """Play a full game with AI over one async connection (needs httpx)."""
+        if httpx is None:
+            raise RuntimeError("play_game_async needs httpx: pip install httpx")
+        
+        print("🎮 Starting 2048 AI Game")
+        async with httpx.AsyncClient(base_url=self.base_url, timeout=None) as client:
+            print("Starting GDB...")
+            await client.post("/start")
+            print("Running game...")
+            await client.post("/run")
+            await asyncio.sleep(2)
+            
+            print("Finding board...")
+            await client.post("/break")
+            await client.post("/find-board")
+            
+            # Independent probes, so let them overlap
+            board, status = await asyncio.gather(client.get("/board"), client.get("/status"))
+            print(f"GDB {status.json().get('status')}")
+            if "board" in board.json():
+                self.print_board(board.json()["board"])
+            
+            print("Enabling AI...")
+            await client.post("/ai-enable")
+            print("AI is playing...")
+            await client.post("/continue")
+            
+            i = 0
+            async with client.stream("GET", "/board/stream") as r:
+                async for line in r.aiter_lines():
+                    if not line.startswith("data: "):
+                        continue
+                    i += 1
+                    print(f"\nMove {i}:")
+                    self.print_board(json.loads(line[len("data: "):])["board"])
+                    if i >= moves:
+                        break
     
     def print_board(self, board):
         """Pretty print the board."""
-        print("  " + "-" * 25)
-        for row in board:
-            line = "  |"
-            for val in row:
-                if val == 0:
-                    line += "     |"
-                else:
-                    line += f"{val:5d}|"
-            print(line)
-        print("  " + "-" * 25)
+        sep = "  " + "-" * 25
+        rows = ["  |" + "|".join(f"{v:5d}" if v else "     " for v in row) + "|"
+                for row in board]
+        print(sep + "\n" + "\n".join(rows) + "\n" + sep)
 
 # Example usage for Claude Code
 if __name__ == "__main__":
@@ -0,0 +1,105 @@
+"""Checks for the bitboard search core in src/python/ai/bitboard.py."""
+
+import importlib.util
+import random
+import sys
+from pathlib import Path
+
+import pytest
+
+BITBOARD = Path(__file__).resolve().parent.parent / "src" / "python" / "ai" / "bitboard.py"
+
+@pytest.fixture(scope="module")
+def plain():
+    """bitboard.py imported as if numba were not installed."""
+    saved = sys.modules.get("numba")
+    sys.modules["numba"] = None  # Makes `import numba` raise ImportError
+    try:
+        spec = importlib.util.spec_from_file_location("bitboard_plain", BITBOARD)
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+    finally:
+        if saved is None:
+            del sys.modules["numba"]
+        else:
+            sys.modules["numba"] = saved
+    assert not module.HAVE_NUMBA
+    return module
+
+@pytest.fixture(scope="module")
+def jitted():
+    """bitboard.py imported by name, as basic_ai does, with numba."""
+    pytest.importorskip("numba")
+    sys.path.insert(0, str(BITBOARD.parent))
+    try:
+        import bitboard
+    finally:
+        sys.path.remove(str(BITBOARD.parent))
+    assert bitboard.HAVE_NUMBA
+    return bitboard
+
+def _boards(n, seed=2048):
+    """Random boards; most put a tile of 256 or more in the last cell (bit 63)."""
+    rng = random.Random(seed)
+    boards = [[2, 4, 8, 16, 4, 8, 16, 32, 8, 16, 32, 64, 16, 32, 64, 256]]
+    for _ in range(n):
+        board = [rng.choice((0, 0, 0, 2, 2, 4, 8, 16, 32, 64, 128)) for _ in range(16)]
+        if rng.random() < 0.75:
+            board[15] = 1 << rng.randint(8, 14)
+        boards.append(board)
+    return boards
+
+def _slide(line):
+    """Slide and merge four tiles towards index 0, the way the game does."""
+    tiles = [v for v in line if v]
+    out = []
+    while tiles:
+        if len(tiles) > 1 and tiles[0] == tiles[1]:
+            out.append(tiles[0] * 2)
+            tiles = tiles[2:]
+        else:
+            out.append(tiles.pop(0))
+    return out + [0] * (4 - len(out))
+
+def _reference_move(board, direction, bb):
+    """Board after a move, computed cell by cell without any bit tricks."""
+    rows = [board[r * 4:r * 4 + 4] for r in range(4)]
+    if direction in (bb.UP, bb.DOWN):
+        rows = [list(col) for col in zip(*rows)]
+    if direction in (bb.RIGHT, bb.DOWN):
+        rows = [_slide(row[::-1])[::-1] for row in rows]
+    else:
+        rows = [_slide(row) for row in rows]
+    if direction in (bb.UP, bb.DOWN):
+        rows = [list(col) for col in zip(*rows)]
+    return [v for row in rows for v in row]
+
+def test_encode_is_unsigned(plain):
+    b = plain.encode([0] * 15 + [256])
+    assert b == 8 << 60
+    assert plain.decode(b) == [0] * 15 + [256]
+
+def test_plain_moves_match_reference(plain):
+    for board in _boards(300):
+        b = plain.encode(board)
+        for d in range(4):
+            expected = _reference_move(board, d, plain)
+            nb = plain.move(b, d, plain.LEFT_MOVE, plain.RIGHT_MOVE)
+            assert plain.decode(nb) == expected, (board, plain.DIRECTIONS[d])
+            assert plain.can_move(b, d) == (expected != board), (board, plain.DIRECTIONS[d])
+        assert plain.free_cells(b) == board.count(0)
+
+def test_no_legal_move_on_a_locked_board(plain):
+    b = plain.encode([2, 4, 8, 16, 4, 8, 16, 32, 8, 16, 32, 64, 16, 32, 64, 256])
+    assert not any(plain.can_move(b, d) for d in range(4))
+    assert plain.best_move(b, 1) == -1
+    assert plain.best_move(b, 1, use_alphabeta=True) == -1
+
+def test_numba_agrees_with_plain(plain, jitted):
+    for board in _boards(100, seed=4096):
+        b = plain.encode(board)
+        assert jitted.encode(board) == b
+        assert [jitted.can_move(b, d) for d in range(4)] == [plain.can_move(b, d) for d in range(4)], board
+        assert jitted.free_cells(b) == plain.free_cells(b)
+        assert jitted.best_move(b, 1) == plain.best_move(b, 1), board
+        assert jitted.best_move(b, 1, True) == plain.best_move(b, 1, True), board
@@ -1,40 +1,59 @@
 #!/usr/bin/env python3
 """GDB Python script for analyzing fibonacci implementations"""
 
+import array
+import re
+
 import gdb
 
+# Bound once: stop() runs on every single fib_recursive call
+_pe = gdb.parse_and_eval
+
+def _atoi(s):
+    """Parse s the way the program's atoi() does: leading digits, else 0."""
+    match = re.match(r'\s*([+-]?\d+)', s)
+    return int(match.group(1)) if match else 0
+
 class FibonacciAnalyzer(gdb.Command):
     """Analyze fibonacci execution patterns"""
     
     def __init__(self):
         super(FibonacciAnalyzer, self).__init__("analyze-fib", gdb.COMMAND_USER)
-        self.call_counts = {}
         
     def invoke(self, arg, from_tty):
+        # fib(N) never recurses on anything above N (the program defaults to 10)
+        words = arg.split()
+        max_n = max(_atoi(words[0]), 0) if words else 10
+        
         # Set up breakpoint with callback
-        bp = FibBreakpoint()
+        bp = FibBreakpoint(max_n)
         
-        # Run the program
-        gdb.execute(f"run {arg}")
+        # Run the program; the breakpoint is sized for this N only
+        try:
+            gdb.execute(f"run {arg}")
+        finally:
+            bp.delete()
         
         # Print analysis
         print("\nCall frequency analysis:")
-        for n, count in sorted(bp.call_counts.items()):
-            print(f"  fib({n}) called {count} times")
+        for n, count in enumerate(bp.call_counts):
+            if count:
+                print(f"  fib({n}) called {count} times")
 
 class FibBreakpoint(gdb.Breakpoint):
     """Breakpoint that tracks fibonacci calls"""
     
-    def __init__(self):
+    def __init__(self, max_n):
         super(FibBreakpoint, self).__init__("fib_recursive")
-        self.call_counts = {}
+        # One counter per n, indexed directly instead of through a dict
+        self.call_counts = array.array('Q', bytes(8 * (max_n + 1)))
         
     def stop(self):
         # Get the value of n
-        n = int(gdb.parse_and_eval("n"))
+        n = int(_pe("n"))
         
         # Track calls
-        self.call_counts[n] = self.call_counts.get(n, 0) + 1
+        self.call_counts[n] += 1
         
         # Don't actually stop
         return False